@@ -13,6 +13,8 @@ This script requires
 
 import argparse
 import logging
+import signal
+import threading
 import time
 from socket import gethostname
 
@@ -21,6 +23,9 @@ from prometheus_client import CollectorRegistry, Histogram
 from .config import Config
 from .nanoRPC import nanoRPC
 from .nanoStats import nano_nodeProcess, nanoProm
+from .pipeline import Pipeline, Snapshot
+from .profiler import CycleProfiler
+from .remoteWrite import RemoteWrite
 from .repeatedTimer import RepeatedTimer
 
 logging.basicConfig(format="%(asctime)s %(levelname)-8s %(message)s", level=logging.DEBUG, datefmt="%Y-%m-%d %H:%M:%S")
@@ -33,18 +38,41 @@ parser.add_argument("--rpc_port", help='"7076" default\trpc port', default="7076
 parser.add_argument("--datapath", help='"~\\Nano" as default', default="~\\Nano\\", action="store")
 parser.add_argument(
     "--push_gateway",
-    help='"http://localhost:9091" prometheus push gateway',
+    help='"http://localhost:9091" prometheus push gateway, empty to disable',
     default="http://localhost:9091",
     action="store",
 )
+parser.add_argument(
+    "--remote_write", help="prometheus remote-write url, user:pass@ for basic auth", default=None, action="store"
+)
+parser.add_argument(
+    "--remote_write_max_samples", help="samples batched per remote-write flush", default=50000, action="store", type=int
+)
+parser.add_argument(
+    "--remote_write_max_age", help="seconds a batch may wait before flushing", default=60, action="store", type=float
+)
+parser.add_argument(
+    "--remote_write_shards", help="parallel remote-write connections", default=4, action="store", type=int
+)
 parser.add_argument("--hostname", help="job name to pass to prometheus", default=gethostname(), action="store")
 parser.add_argument("--interval", help="interval to sleep", default="10", action="store", type=int)
+parser.add_argument(
+    "--cycle_deadline", help="seconds rpc calls may take per cycle", default=5, action="store", type=float
+)
+parser.add_argument(
+    "--queue_depth", help="snapshots buffered between pipeline stages", default=1, action="store", type=int
+)
 parser.add_argument("--username", help="Username for basic auth on push_gateway", default="", action="store")
 parser.add_argument("--password", help="Password for basic auth on push_gateway", default="", action="store")
 parser.add_argument(
     "--config_path", help="Path to config.ini \nIgnores other CLI arguments", default=None, action="store"
 )
 parser.add_argument("--runid", help="run id to pass to prometheus", default=None, action="store")
+parser.add_argument(
+    "--profile", help="profile the first cycles, SIGUSR1 triggers a run later", default=False, action="store_true"
+)
+parser.add_argument("--profile_cycles", help="cycles covered by one profile run", default=5, action="store", type=int)
+parser.add_argument("--profile_dir", help="directory for profile reports", default="./profiles", action="store")
 
 args = parser.parse_args()
 cnf = Config(args)
@@ -54,9 +82,15 @@ rpcLatency = Histogram("nano_rpc_response", "response time from rpc calls", ["me
 statsCollection = nanoRPC(cnf)
 promCollection = nanoProm(cnf, registry)
 process_stats = nano_nodeProcess(promCollection)
+promCollection.addSources(list(statsCollection.Commands) + ["process"])
+remoteWrite = RemoteWrite(cnf, registry) if cnf.remote_write else None
+profiler = CycleProfiler(cnf.profile_dir, cnf.profile_cycles, registry=registry)
+
+pipeline = Pipeline(registry, depth=cnf.queue_depth)
 
 last_time = 0
 
+
 def try_gather_process_stats():
     try:
         process_stats.node_process_stats()
@@ -64,28 +98,62 @@ def try_gather_process_stats():
         logging.exception(e)
 
 
-def main():
-    logging.info("Starting main loop")
+def gather():
+    return time.time(), statsCollection.gatherStats(rpcLatency)
 
-    stats = statsCollection.gatherStats(rpcLatency)
-    
-    try_gather_process_stats()
 
+def transform(snapshot):
+    timestamp, stats = snapshot
     promCollection.update(stats)
-    promCollection.pushStats(registry)
+    # freeze the values now, later cycles keep changing the registry
+    return Snapshot(registry, timestamp)
+
+
+def publish(snapshot):
+    if remoteWrite is not None:
+        remoteWrite.addSnapshot(snapshot.collect(), snapshot.timestamp)
+        remoteWrite.maybeFlush()
+    promCollection.pushStats(snapshot)
 
     global last_time
     curr_time = time.time()
-    logging.info("Finished main loop, elapsed time: %s", curr_time - last_time)
+    logging.info("Published stats, elapsed time: %s", curr_time - last_time)
     last_time = curr_time
 
 
+def main():
+    """Gather, transform and publish run as separate stages joined by
+    latest-value-wins queues, so a slow stage never delays sampling
+    """
+    logging.info("Starting main loop")
+    interval = int(cnf.interval)
+    rpc_queue = pipeline.queue("rpc")
+    publish_queue = pipeline.queue("publish")
+    pipeline.stage("gather", gather, outbox=rpc_queue, interval=interval, wrap=profiler.cycle)
+    pipeline.stage("process", try_gather_process_stats, interval=interval, wrap=profiler.section)
+    pipeline.stage("transform", transform, inbox=rpc_queue, outbox=publish_queue, wrap=profiler.section)
+    pipeline.stage("publish", publish, inbox=publish_queue, wrap=profiler.section)
+
+    shutdown = threading.Event()
+
+    def handle(signum, frame):
+        shutdown.set()
+
+    signal.signal(signal.SIGINT, handle)
+    signal.signal(signal.SIGTERM, handle)
+    profiler.install_signal()
+    if args.profile:
+        profiler.request()
+
+    pipeline.start()
+    while not shutdown.wait(1):
+        pass
+
+    logging.info("Shutting down, flushing in-flight stats")
+    pipeline.stop()
+    if remoteWrite is not None:
+        remoteWrite.flush()
+
+
 if __name__ == "__main__":
-    # RepeatedTimer(cnf.interval, main).start()
-    while True:
-        try:
-            main()
-        except Exception as e:
-            logging.exception(e)
-
-        time.sleep(args.interval)
\ No newline at end of file
+    main()
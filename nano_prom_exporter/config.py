@@ -6,12 +6,22 @@ class Config(object):
     def __init__(self, args):
         self.rpc_ip = args.rpchost
         self.rpc_port = args.rpc_port
-        self.push_gateway = {args.push_gateway: {
-            "username": args.username, "password": args.password}}
+        self.push_gateway = {}
+        if args.push_gateway != "":
+            self.push_gateway[args.push_gateway] = {
+                "username": args.username, "password": args.password}
+        self.remote_write = args.remote_write
+        self.remote_write_max_samples = args.remote_write_max_samples
+        self.remote_write_max_age = args.remote_write_max_age
+        self.remote_write_shards = args.remote_write_shards
         self.node_data_path = args.datapath
         self.hostname = args.hostname
         self.interval = args.interval
+        self.queue_depth = args.queue_depth
+        self.cycle_deadline = args.cycle_deadline
         self.runid = args.runid
+        self.profile_dir = args.profile_dir
+        self.profile_cycles = args.profile_cycles
 
         logging.info("loaded config, %s", self.__config_file(args.config_path))
 
@@ -30,6 +40,22 @@ class Config(object):
             'DEFAULT', 'hostname', fallback=self.hostname)
         self.interval = config.get(
             'DEFAULT', 'interval', fallback=self.interval)
+        self.queue_depth = config.getint(
+            'DEFAULT', 'queueDepth', fallback=self.queue_depth)
+        self.cycle_deadline = config.getfloat(
+            'DEFAULT', 'cycleDeadline', fallback=self.cycle_deadline)
+        self.profile_dir = config.get(
+            'DEFAULT', 'profileDir', fallback=self.profile_dir)
+        self.profile_cycles = config.getint(
+            'DEFAULT', 'profileCycles', fallback=self.profile_cycles)
+        self.remote_write = config.get(
+            'DEFAULT', 'remoteWrite', fallback=self.remote_write)
+        self.remote_write_max_samples = config.getint(
+            'DEFAULT', 'remoteWriteMaxSamples', fallback=self.remote_write_max_samples)
+        self.remote_write_max_age = config.getfloat(
+            'DEFAULT', 'remoteWriteMaxAge', fallback=self.remote_write_max_age)
+        self.remote_write_shards = config.getint(
+            'DEFAULT', 'remoteWriteShards', fallback=self.remote_write_shards)
         self.push_gateway = {}
         for gateway in config.sections():
             username = config.get(gateway, 'username', fallback="")
@@ -1,4 +1,7 @@
+import logging
 import os
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
 
 import requests
 
@@ -8,7 +11,7 @@ def to_multiplier(difficulty: int, base_difficulty) -> float:
 
 
 class nanoStats:
-    def __init__(self, collection):
+    def __init__(self, collection, lastSuccess=None):
         """Collection of stats to pass into rpc
             ActiveDifficulty
             BlockCount
@@ -22,29 +25,47 @@ class nanoStats:
             Frontiers
             OnlineStake
             PeersStake
+        fields missing from the collection are None and
+        the command they come from is listed in Invalid
         """
-        self.ActiveDifficulty = collection['active_difficulty']['multiplier']
-        self.NetworkReceiveCurrent = to_multiplier(
+        self.LastSuccess = dict(lastSuccess or {})
+        self.Invalid = set()
+        self.ActiveDifficulty = self.field(
+            "active_difficulty", lambda: collection['active_difficulty']['multiplier'])
+        self.NetworkReceiveCurrent = self.field("active_difficulty", lambda: to_multiplier(
             int(
                 collection['active_difficulty']['network_receive_current'],
                 16),
             int(
                 collection['active_difficulty']['network_receive_minimum'],
-                16))
-        self.BlockCount = collection['block_count']
-        self.ConfirmationHistory = collection['confirmation_history']
-        self.Peers = collection['peers']
-        self.StatsCounters = collection['stats_counters']
-        self.StatsObjects = collection['stats_objects']['node']
-        self.Uptime = collection['uptime']['seconds']
-        self.Version = collection['version']
-        self.Frontiers = collection['frontier_count']['count']
-        self.OnlineStake = collection['confirmation_quorum']['online_stake_total']
-        self.QuorumDelta = collection['confirmation_quorum']['quorum_delta']
-        self.PeersStake = collection['confirmation_quorum']['peers_stake_total']
-        self.TrendedStake = collection['confirmation_quorum']['trended_stake_total']
-        self.TelemetryRaw = collection['telemetry_raw']['metrics']
-        self.Telemetry = collection['telemetry']
+                16)))
+        self.BlockCount = self.field("block_count", lambda: collection['block_count'])
+        self.ConfirmationHistory = self.field(
+            "confirmation_history", lambda: collection['confirmation_history'])
+        self.Peers = self.field("peers", lambda: collection['peers'])
+        self.StatsCounters = self.field("stats_counters", lambda: collection['stats_counters'])
+        self.StatsObjects = self.field("stats_objects", lambda: collection['stats_objects']['node'])
+        self.Uptime = self.field("uptime", lambda: collection['uptime']['seconds'])
+        self.Version = self.field("version", lambda: collection['version'])
+        self.Frontiers = self.field("frontier_count", lambda: collection['frontier_count']['count'])
+        self.OnlineStake = self.field(
+            "confirmation_quorum", lambda: collection['confirmation_quorum']['online_stake_total'])
+        self.QuorumDelta = self.field(
+            "confirmation_quorum", lambda: collection['confirmation_quorum']['quorum_delta'])
+        self.PeersStake = self.field(
+            "confirmation_quorum", lambda: collection['confirmation_quorum']['peers_stake_total'])
+        self.TrendedStake = self.field(
+            "confirmation_quorum", lambda: collection['confirmation_quorum']['trended_stake_total'])
+        self.TelemetryRaw = self.field("telemetry_raw", lambda: collection['telemetry_raw']['metrics'])
+        self.Telemetry = self.field("telemetry", lambda: collection['telemetry'])
+
+    def field(self, source, read):
+        """Returns None and marks source invalid when read fails"""
+        try:
+            return read()
+        except (KeyError, TypeError, ValueError):
+            self.Invalid.add(source)
+            return None
 
 
 class nanoRPC:
@@ -54,7 +75,10 @@ class nanoRPC:
         accepts config returns stats object
         """
         self.uri = "http://" + config.rpc_ip + ":" + config.rpc_port
+        self.deadline = config.cycle_deadline
         self.lastData = {}
+        self.lastSuccess = {}
+        self.inflight = {}
         Version = {"action": "version"}
         BlockCount = {"action": "block_count"}
         Peers = {"action": "peers"}
@@ -80,17 +104,56 @@ class nanoRPC:
             "confirmation_quorum": Quorum,
             "telemetry_raw": TelemetryRaw,
             "telemetry": Telemetry}
-            
-    def rpcWrapper(self, msg):
-        response = requests.post(url=self.uri, json=msg, timeout=7)
+        self.executor = ThreadPoolExecutor(max_workers=len(self.Commands))
+
+    def rpcWrapper(self, msg, timeout=7):
+        response = requests.post(url=self.uri, json=msg, timeout=timeout)
+        return response
+
+    def call(self, a, rpcLatency, timeout):
+        with rpcLatency.labels(a).time():
+            response = self.rpcWrapper(self.Commands[a], timeout).json()
+        if "error" in response:
+            raise Exception((a, response["error"]))
         return response
 
     def gatherStats(self, rpcLatency):
+        """Runs all commands in parallel within the cycle deadline,
+        commands that fail or miss it keep their last good value
+        """
+        timeout = min(7, self.deadline)
+        calls = {}
         for a in self.Commands:
-            with rpcLatency.labels(a).time():
-                response = self.rpcWrapper(self.Commands[a])
-                response = response.json()
-                self.lastData[a] = response
-                
-        stats = nanoStats(self.lastData)
+            previous = self.inflight.get(a)
+            if previous is not None and not previous.done():
+                logging.warning("rpc %s still running from an earlier cycle, counted as missed", a)
+                continue
+            self.inflight[a] = self.executor.submit(self.call, a, rpcLatency, timeout)
+            calls[self.inflight[a]] = a
+        done, missed = wait(calls, timeout=self.deadline)
+
+        # a running request cannot be cancelled, its result is ignored
+        # and the command is not resubmitted until it has finished
+        for call in missed:
+            logging.warning("rpc %s missed the %ss deadline, abandoned", calls[call], self.deadline)
+        answered = dict(self.lastData)
+        for call in done:
+            try:
+                answered[calls[call]] = call.result()
+            except Exception as e:
+                logging.warning("rpc %s failed: %s", calls[call], e)
+
+        # only responses whose fields parse replace the last good value
+        invalid = nanoStats(answered).Invalid
+        now = time.time()
+        for a, response in answered.items():
+            if response is self.lastData.get(a):
+                continue
+            if a in invalid:
+                logging.warning("rpc %s answered without the expected fields", a)
+                continue
+            self.lastData[a] = response
+            self.lastSuccess[a] = now
+
+        stats = nanoStats(self.lastData, self.lastSuccess)
         return stats
@@ -1,6 +1,7 @@
 from collections import namedtuple
 import logging
 import os
+import time
 
 import psutil
 from prometheus_client import Gauge, Info, push_to_gateway
@@ -96,6 +97,7 @@ class nano_nodeProcess:
             # self.nanoProm.vms.labels(a.pid).set(a.memory_info().vms)
             # self.nanoProm.pp.labels(a.pid).set(a.memory_info().paged_pool)
             self.nanoProm.cpu.labels(a.pid).set(a.cpu_percent(interval=0.1))
+        self.nanoProm.success("process")
 
     def get_threads_cpu_percent(self, p, interval=0.1):
         total_percent = p.cpu_percent(interval)
@@ -109,6 +111,20 @@ class nano_nodeProcess:
 class nanoProm:
     def __init__(self, config, registry):
         self.config = config
+        self.lastSuccess = {}
+        self.started = time.time()
+        self.LastSuccessTimestamp = Gauge(
+            "nano_prom_last_success_timestamp",
+            "Unix time of the last successful collection by source",
+            ["source"],
+            registry=registry,
+        )
+        self.Staleness = Gauge(
+            "nano_prom_staleness_seconds",
+            "Seconds since the last successful collection by source",
+            ["source"],
+            registry=registry,
+        )
         self.ActiveDifficulty = Gauge(
             "nano_active_difficulty", "Active Difficulty Multiplier", registry=registry
         )
@@ -293,12 +309,64 @@ class nanoProm:
             "network_raw_rx", "Raw rx from psutil", registry=registry
         )
 
+    def success(self, source, timestamp=None):
+        self.lastSuccess[source] = timestamp or time.time()
+
+    def addSources(self, sources):
+        """Sources that never succeed show a last success of 0
+        and are stale since startup
+        """
+        for source in sources:
+            self.lastSuccess.setdefault(source, 0)
+        self.updateStaleness()
+
+    def updateStaleness(self):
+        now = time.time()
+        for source, timestamp in list(self.lastSuccess.items()):
+            self.LastSuccessTimestamp.labels(source).set(timestamp)
+            self.Staleness.labels(source).set(now - (timestamp or self.started))
+
+    @staticmethod
+    def setIfPresent(gauge, value):
+        if value is not None:
+            gauge.set(value)
+
     def update(self, stats):
-        self.ActiveDifficulty.set(stats.ActiveDifficulty)
-        self.NetworkReceiveCurrent.set(stats.NetworkReceiveCurrent)
-        self.Uptime.set(stats.Uptime)
-        self.Frontiers.set(stats.Frontiers)
+        """Sets gauges from stats group by group, a group that fails
+        or whose fields are None keeps its last values and shows up
+        as stale
+        """
+        for source, timestamp in stats.LastSuccess.items():
+            self.success(source, timestamp)
+        self.updateStaleness()
+
+        for group in (
+            self.updateScalars,
+            self.updateDatabase,
+            self.updatePeers,
+            self.updateBlockCount,
+            self.updateTelemetry,
+            self.updateConfirmationHistory,
+            self.updateStatsCounters,
+            self.updateVersion,
+            self.updateStatsObjects,
+        ):
+            try:
+                group(stats)
+            except Exception as e:
+                logging.warning("%s skipped: %r", group.__name__, e)
 
+    def updateScalars(self, stats):
+        self.setIfPresent(self.ActiveDifficulty, stats.ActiveDifficulty)
+        self.setIfPresent(self.NetworkReceiveCurrent, stats.NetworkReceiveCurrent)
+        self.setIfPresent(self.Uptime, stats.Uptime)
+        self.setIfPresent(self.Frontiers, stats.Frontiers)
+        self.setIfPresent(self.QuorumDelta, stats.QuorumDelta)
+        self.setIfPresent(self.OnlineStake, stats.OnlineStake)
+        self.setIfPresent(self.PeersStake, stats.PeersStake)
+        self.setIfPresent(self.TrendedStake, stats.TrendedStake)
+
+    def updateDatabase(self, stats):
         if os.path.exists(self.config.node_data_path + "data.ldb"):
             self.databaseSize.labels("lmdb").set(
                 os.path.getsize(self.config.node_data_path + "data.ldb")
@@ -313,17 +381,23 @@ class nanoProm:
                 psutil.disk_usage(self.config.node_data_path).used
             )
 
-        self.QuorumDelta.set(stats.QuorumDelta)
-        self.OnlineStake.set(stats.OnlineStake)
-        self.PeersStake.set(stats.PeersStake)
-        self.TrendedStake.set(stats.TrendedStake)
-        self.PeersCount.set(len(stats.Peers["peers"]))
+    def updatePeers(self, stats):
+        if stats.Peers is not None:
+            self.PeersCount.set(len(stats.Peers["peers"]))
 
-        for a in stats.BlockCount:
+    def updateBlockCount(self, stats):
+        for a in stats.BlockCount or {}:
             self.BlockCount.labels(a).set(stats.BlockCount[a])
 
+    def updateTelemetry(self, stats):
         for a in stats.TelemetryRaw or [] + [stats.Telemetry]:
-            endpoint = telemetry_raw(a)
+            if a is None:
+                continue
+            try:
+                endpoint = telemetry_raw(a)
+            except KeyError as e:
+                logging.warning("incomplete telemetry entry: %r", e)
+                continue
 
             self.telemetry_raw_blocks.labels(endpoint=endpoint.endpoint).set(
                 endpoint.block_count
@@ -368,30 +442,39 @@ class nanoProm:
                 endpoint.timestamp
             )
 
-        if int(stats.ConfirmationHistory["confirmation_stats"]["count"]) > 0:
+    def updateConfirmationHistory(self, stats):
+        if (
+            stats.ConfirmationHistory is not None
+            and int(stats.ConfirmationHistory["confirmation_stats"]["count"]) > 0
+        ):
             self.ConfirmationHistory.labels(
                 stats.ConfirmationHistory["confirmation_stats"]["count"]
             ).set(stats.ConfirmationHistory["confirmation_stats"]["average"])
 
-        for entry in stats.StatsCounters["entries"]:
-            self.StatsCounters.labels(entry["type"], entry["detail"], entry["dir"]).set(
-                entry["value"]
-            )
+    def updateStatsCounters(self, stats):
+        if stats.StatsCounters is not None:
+            for entry in stats.StatsCounters["entries"]:
+                self.StatsCounters.labels(entry["type"], entry["detail"], entry["dir"]).set(
+                    entry["value"]
+                )
 
-        self.Version.info(
-            {
-                "rpc_version": stats.Version["rpc_version"],
-                "store_version": stats.Version["store_version"],
-                "protocol_version": stats.Version["protocol_version"],
-                "node_vendor": stats.Version["node_vendor"],
-                "store_vendor": stats.Version["store_vendor"],
-                "network": stats.Version["network"],
-                "network_identifier": stats.Version["network_identifier"],
-                "build_info": stats.Version["build_info"],
-            }
-        )
+    def updateVersion(self, stats):
+        if stats.Version is not None:
+            self.Version.info(
+                {
+                    "rpc_version": stats.Version["rpc_version"],
+                    "store_version": stats.Version["store_version"],
+                    "protocol_version": stats.Version["protocol_version"],
+                    "node_vendor": stats.Version["node_vendor"],
+                    "store_vendor": stats.Version["store_vendor"],
+                    "network": stats.Version["network"],
+                    "network_identifier": stats.Version["network_identifier"],
+                    "build_info": stats.Version["build_info"],
+                }
+            )
 
-        for l1 in stats.StatsObjects:
+    def updateStatsObjects(self, stats):
+        for l1 in stats.StatsObjects or {}:
             for l2 in stats.StatsObjects[l1]:
                 if "size" in stats.StatsObjects[l1][l2]:
                     self.StatsObjectsSize.labels(l1, l2).set(
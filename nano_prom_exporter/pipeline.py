@@ -0,0 +1,131 @@
+import collections
+import logging
+import threading
+import time
+from contextlib import nullcontext
+
+from prometheus_client import Counter, Gauge, Histogram
+
+_EMPTY = object()
+
+
+class Snapshot(object):
+    def __init__(self, registry, timestamp):
+        """Metric families frozen at one point in time, usable
+        wherever a registry is collected
+        """
+        self.timestamp = timestamp
+        self.families = list(registry.collect())
+
+    def collect(self):
+        return iter(self.families)
+
+
+class LatestQueue(object):
+    def __init__(self, name, maxsize, depth, dropped):
+        """Bounded queue where the newest item wins,
+        putting into a full queue drops the oldest item
+        """
+        self.name = name
+        self._items = collections.deque(maxlen=maxsize)
+        self._cond = threading.Condition()
+        self.depth = depth.labels(name)
+        self.dropped = dropped.labels(name)
+
+    def put(self, item):
+        with self._cond:
+            if len(self._items) == self._items.maxlen:
+                self.dropped.inc()
+            self._items.append(item)
+            self.depth.set(len(self._items))
+            self._cond.notify()
+
+    def get(self, timeout):
+        with self._cond:
+            if not self._items:
+                self._cond.wait(timeout)
+            if not self._items:
+                return _EMPTY
+            item = self._items.popleft()
+            self.depth.set(len(self._items))
+            return item
+
+
+class Stage(threading.Thread):
+    def __init__(self, name, function, latency, inbox=None, outbox=None, interval=None, wrap=nullcontext):
+        """Runs function every interval when inbox is None,
+        otherwise once per item taken from inbox, results
+        are put into outbox
+        """
+        super().__init__(name=name, daemon=True)
+        self.function = function
+        self.latency = latency.labels(name)
+        self.inbox = inbox
+        self.outbox = outbox
+        self.interval = interval
+        self.wrap = wrap
+        self.stopping = threading.Event()
+
+    def run(self):
+        if self.inbox is None:
+            while not self.stopping.is_set():
+                started = time.time()
+                self.step()
+                self.stopping.wait(max(0, self.interval - (time.time() - started)))
+        else:
+            # keep draining the inbox until it is empty after a stop
+            while True:
+                item = self.inbox.get(timeout=0.5)
+                if item is not _EMPTY:
+                    self.step(item)
+                elif self.stopping.is_set():
+                    break
+
+    def step(self, *item):
+        try:
+            with self.latency.time(), self.wrap():
+                result = self.function(*item)
+        except Exception as e:
+            logging.exception(e)
+            return
+
+        if self.outbox is not None:
+            self.outbox.put(result)
+
+
+class Pipeline(object):
+    def __init__(self, registry, depth=1):
+        """Stages joined by LatestQueues, stop() shuts stages down
+        in the order they were added so in-flight items are flushed
+        """
+        self.maxsize = max(1, depth)
+        self.stages = []
+        self.depth = Gauge(
+            "nano_prom_pipeline_queue_depth", "Items waiting between pipeline stages", ["queue"], registry=registry
+        )
+        self.dropped = Counter(
+            "nano_prom_pipeline_dropped",
+            "Snapshots replaced by a newer one before being consumed",
+            ["queue"],
+            registry=registry,
+        )
+        self.latency = Histogram(
+            "nano_prom_pipeline_stage_seconds", "Time spent per pipeline stage step", ["stage"], registry=registry
+        )
+
+    def queue(self, name):
+        return LatestQueue(name, self.maxsize, self.depth, self.dropped)
+
+    def stage(self, name, function, **kwargs):
+        stage = Stage(name, function, self.latency, **kwargs)
+        self.stages.append(stage)
+        return stage
+
+    def start(self):
+        for stage in self.stages:
+            stage.start()
+
+    def stop(self):
+        for stage in self.stages:
+            stage.stopping.set()
+            stage.join()
@@ -0,0 +1,161 @@
+import cProfile
+import io
+import logging
+import os
+import pstats
+import signal
+import sys
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+
+from prometheus_client import Gauge
+
+# from 3.12 a single cProfile covers every thread and a second
+# enabled profiler raises ValueError
+PROCESS_WIDE = sys.version_info >= (3, 12)
+
+
+class CycleProfiler(object):
+    def __init__(self, output_dir, cycles=5, top=20, registry=None):
+        """Profile the next N cycles of the main loop on demand
+        armed by request() or a signal, writes a pstats dump
+        plus text reports to output_dir once the cycles are done
+        """
+        self.output_dir = os.path.expanduser(output_dir)
+        self.cycles = cycles
+        self.top = top
+        self._pending = 0
+        self._remaining = 0
+        self._stats = None
+        self._profile = None
+        self._lock = threading.Lock()
+        self.slowest = None
+        if registry is not None:
+            self.slowest = Gauge(
+                "nano_prom_profile_function_seconds",
+                "Cumulative time of the slowest functions in the last profile run",
+                ["function"],
+                registry=registry,
+            )
+
+    def request(self, cycles=None):
+        self._pending = max(1, cycles or self.cycles)
+
+    def install_signal(self, signum=getattr(signal, "SIGUSR1", None)):
+        if signum is None:
+            logging.warning("Signal triggered profiling is not supported on this platform")
+            return
+
+        def handle(signum, frame):
+            self.request()
+
+        signal.signal(signum, handle)
+
+    @contextmanager
+    def cycle(self):
+        """Profile one counted cycle"""
+        if self._pending and not self._remaining:
+            self._start()
+        if not self._remaining:
+            yield
+            return
+
+        try:
+            with self._profiled():
+                yield
+        finally:
+            self._remaining -= 1
+            if not self._remaining:
+                self._finish()
+
+    @contextmanager
+    def section(self):
+        """Profile work on another thread while a run is active
+        without counting it as a cycle
+        """
+        if not self._remaining:
+            yield
+            return
+
+        with self._profiled():
+            yield
+
+    @contextmanager
+    def _profiled(self):
+        if PROCESS_WIDE:
+            yield
+            return
+
+        profile = cProfile.Profile()
+        try:
+            profile.enable()
+        except ValueError as e:
+            logging.warning("Profiling unavailable: %s", e)
+            yield
+            return
+        try:
+            yield
+        finally:
+            profile.disable()
+            with self._lock:
+                if self._stats is not None:
+                    self._stats.add(profile)
+
+    def _start(self):
+        with self._lock:
+            self._stats = pstats.Stats()
+        self._remaining = self._pending
+        self._pending = 0
+        if PROCESS_WIDE:
+            self._profile = cProfile.Profile()
+            try:
+                self._profile.enable()
+            except ValueError as e:
+                logging.warning("Profiling unavailable: %s", e)
+                self._profile = None
+        tracemalloc.start()
+        logging.info("Profiling next %s cycles", self._remaining)
+
+    def _finish(self):
+        snapshot = tracemalloc.take_snapshot()
+        tracemalloc.stop()
+        if self._profile is not None:
+            self._profile.disable()
+        with self._lock:
+            stats, self._stats = self._stats, None
+            if self._profile is not None:
+                stats.add(self._profile)
+                self._profile = None
+
+        # runs inside the profiled stage, a failed report must not lose its data
+        try:
+            self.report(stats, snapshot)
+        except Exception as e:
+            logging.exception(e)
+
+    def report(self, stats, snapshot):
+        os.makedirs(self.output_dir, exist_ok=True)
+        prefix = os.path.join(self.output_dir, "nano_prom_%s" % time.strftime("%Y%m%d-%H%M%S"))
+        stats.dump_stats(prefix + ".pstats")
+
+        report = io.StringIO()
+        stats.stream = report
+        stats.sort_stats("cumulative").print_stats(self.top)
+        with open(prefix + "_cpu.txt", "w") as f:
+            f.write(report.getvalue())
+
+        with open(prefix + "_alloc.txt", "w") as f:
+            for stat in snapshot.statistics("lineno")[: self.top]:
+                f.write("%s\n" % stat)
+
+        if self.slowest is not None:
+            self.publish(stats)
+        logging.info("Wrote profile reports to %s*", prefix)
+
+    def publish(self, stats):
+        self.slowest.clear()
+        entries = sorted(stats.stats.items(), key=lambda item: item[1][3], reverse=True)
+        for (filename, line, name), (_, _, _, cumulative, _) in entries[: self.top]:
+            self.slowest.labels("%s:%s(%s)" % (os.path.basename(filename), line, name)).set(cumulative)
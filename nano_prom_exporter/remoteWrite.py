@@ -0,0 +1,199 @@
+import logging
+import struct
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from prometheus_client import Counter
+
+try:
+    import snappy
+except ImportError:
+    snappy = None
+
+
+def _varint(value):
+    out = bytearray()
+    while value > 0x7F:
+        out.append((value & 0x7F) | 0x80)
+        value >>= 7
+    out.append(value)
+    return bytes(out)
+
+
+def _field(number, payload):
+    return _varint(number << 3 | 2) + _varint(len(payload)) + payload
+
+
+def encode_write_request(series):
+    """Encode {labels: [(value, timestamp_ms)]} as a prometheus.WriteRequest
+    labels must be a tuple of (name, value) pairs sorted by name
+    """
+    body = bytearray()
+    for labels, samples in series.items():
+        ts = bytearray()
+        for name, value in labels:
+            ts += _field(1, _field(1, name.encode()) + _field(2, value.encode()))
+        for value, timestamp in samples:
+            sample = b"\x09" + struct.pack("<d", value) + b"\x10" + _varint(timestamp)
+            ts += _field(2, sample)
+        body += _field(1, bytes(ts))
+    return bytes(body)
+
+
+def snappy_compress(data):
+    """Snappy block format, falls back to literal-only blocks
+    when python-snappy is not installed
+    """
+    if snappy is not None:
+        return snappy.compress(data)
+
+    out = bytearray(_varint(len(data)))
+    for start in range(0, len(data), 65536):
+        chunk = data[start:start + 65536]
+        if len(chunk) <= 60:
+            out.append((len(chunk) - 1) << 2)
+        else:
+            out.append(61 << 2)
+            out += struct.pack("<H", len(chunk) - 1)
+        out += chunk
+    return bytes(out)
+
+
+class RemoteWrite(object):
+    def __init__(self, config, registry):
+        """Batches registry snapshots and sends them to a
+        prometheus remote-write receiver, series are sharded
+        across parallel connections
+        """
+        self.url = config.remote_write
+        self.max_samples = config.remote_write_max_samples
+        self.max_age = config.remote_write_max_age
+        self.shards = max(1, config.remote_write_shards)
+        self.extra_labels = (("instance", config.hostname), ("job", config.runid or config.hostname))
+        self._lock = threading.Lock()
+        self._pending = {}
+        self._pending_count = 0
+        self._oldest = None
+        self._backoff = 0
+        self._retry_at = 0
+        self._sessions = [requests.Session() for _ in range(self.shards)]
+        self._executor = ThreadPoolExecutor(max_workers=self.shards)
+        self.sent = Counter(
+            "nano_prom_remote_write_samples",
+            "Samples accepted by the remote-write receiver",
+            registry=registry,
+        )
+        self.failed = Counter(
+            "nano_prom_remote_write_failed_samples",
+            "Samples dropped after a failed remote-write request",
+            registry=registry,
+        )
+
+    def addSnapshot(self, families, timestamp=None):
+        """Queues metric families collected from a registry,
+        samples without their own timestamp get timestamp
+        """
+        timestamp = int((timestamp or time.time()) * 1000)
+        with self._lock:
+            for metric in families:
+                for sample in metric.samples:
+                    labels = dict(self.extra_labels)
+                    labels.update(sample.labels)
+                    labels["__name__"] = sample.name
+                    key = tuple(sorted(labels.items()))
+                    self._pending.setdefault(key, []).append(
+                        (float(sample.value), int(sample.timestamp * 1000) if sample.timestamp else timestamp)
+                    )
+                    self._pending_count += 1
+            if self._oldest is None:
+                self._oldest = time.time()
+
+    def due(self):
+        if self._oldest is None:
+            return False
+        return self._pending_count >= self.max_samples or time.time() - self._oldest >= self.max_age
+
+    def maybeFlush(self):
+        if self.due() and time.time() >= self._retry_at:
+            self.flush()
+
+    def flush(self):
+        """Sends all pending samples, shards that fail with a
+        retryable error are kept for the next flush with backoff
+        """
+        with self._lock:
+            pending, self._pending = self._pending, {}
+            oldest, self._oldest = self._oldest, None
+            self._pending_count = 0
+        if not pending:
+            return
+
+        shards = [{} for _ in range(self.shards)]
+        for labels, samples in pending.items():
+            shards[hash(labels) % self.shards][labels] = samples
+
+        sends = [
+            self._executor.submit(self.send, self._sessions[i], shard)
+            for i, shard in enumerate(shards)
+            if shard
+        ]
+        retry = {}
+        retry_count = 0
+        for send in sends:
+            failed = send.result()
+            count = sum(len(samples) for samples in failed.values())
+            if retry_count + count > self.max_samples:
+                logging.error("remote write retry backlog full, dropping %s samples", count)
+                self.failed.inc(count)
+                continue
+            retry.update(failed)
+            retry_count += count
+
+        if retry:
+            self._backoff = min(max(1, self._backoff * 2), self.max_age)
+            self._retry_at = time.time() + self._backoff
+            self._requeue(retry, retry_count, oldest)
+        else:
+            self._backoff = 0
+            self._retry_at = 0
+
+    def _requeue(self, series, count, oldest):
+        with self._lock:
+            for labels, samples in series.items():
+                self._pending[labels] = samples + self._pending.get(labels, [])
+            self._pending_count += count
+            if self._oldest is None or oldest < self._oldest:
+                self._oldest = oldest
+
+    def send(self, session, series):
+        """Returns the series to retry, samples rejected
+        with a non-retryable 4xx are dropped
+        """
+        count = sum(len(samples) for samples in series.values())
+        try:
+            response = session.post(
+                self.url,
+                data=snappy_compress(encode_write_request(series)),
+                headers={
+                    "Content-Encoding": "snappy",
+                    "Content-Type": "application/x-protobuf",
+                    "X-Prometheus-Remote-Write-Version": "0.1.0",
+                },
+                timeout=7,
+            )
+        except requests.RequestException as e:
+            logging.warning("remote write failed, retrying %s samples: %s", count, e)
+            return series
+
+        if response.status_code == 429 or response.status_code >= 500:
+            logging.warning("remote write returned %s, retrying %s samples", response.status_code, count)
+            return series
+        if response.status_code >= 400:
+            logging.error("remote write rejected %s samples: %s %s", count, response.status_code, response.text)
+            self.failed.inc(count)
+            return {}
+
+        self.sent.inc(count)
+        return {}
@@ -21,5 +21,7 @@ setuptools.setup(
         'requests',
         'prometheus-client',
         'psutil'],
+    extras_require={
+        'snappy': ['python-snappy']},
     entry_points={
         'console_scripts': ['nano-prom=nano_prom_exporter.__main__:main']})
@@ -0,0 +1,215 @@
+import http.server
+import json
+import threading
+import time
+from types import SimpleNamespace
+
+import pytest
+from prometheus_client import CollectorRegistry, Histogram
+
+from nano_prom_exporter.nanoRPC import nanoRPC
+from nano_prom_exporter.nanoStats import nanoProm
+
+TELEMETRY = {
+    "block_count": "5",
+    "cemented_count": "4",
+    "unchecked_count": "0",
+    "account_count": "3",
+    "bandwidth_cap": "0",
+    "peer_count": "2",
+    "protocol_version": "19",
+    "major_version": "24",
+    "minor_version": "0",
+    "patch_version": "0",
+    "pre_release_version": "0",
+    "uptime": "100",
+    "genesis_block": "G",
+    "maker": "0",
+    "timestamp": "1000",
+    "active_difficulty": "fffffff800000000",
+}
+
+RESPONSES = {
+    "version": {
+        "rpc_version": "1",
+        "store_version": "21",
+        "protocol_version": "19",
+        "node_vendor": "Nano V24.0",
+        "store_vendor": "LMDB",
+        "network": "beta",
+        "network_identifier": "id",
+        "build_info": "build",
+    },
+    "block_count": {"count": "10", "unchecked": "1", "cemented": "9"},
+    "peers": {"peers": {"[::1]:54000": "19"}},
+    "stats_counters": {"entries": [{"type": "ledger", "detail": "all", "dir": "in", "value": "3"}]},
+    "stats_objects": {"node": {"ledger": {"bootstrap_weights": {"count": "1", "size": "2"}}}},
+    "confirmation_history": {"confirmation_stats": {"count": "2", "average": "150"}},
+    "uptime": {"seconds": "100"},
+    "active_difficulty": {
+        "multiplier": "1",
+        "network_receive_current": "fffffe0000000000",
+        "network_receive_minimum": "fffffe0000000000",
+    },
+    "frontier_count": {"count": "4"},
+    "confirmation_quorum": {
+        "online_stake_total": "1",
+        "quorum_delta": "2",
+        "peers_stake_total": "3",
+        "trended_stake_total": "4",
+    },
+    "telemetry_raw": {"metrics": [dict(TELEMETRY, address="::1", port="54000", node_id="node")]},
+    "telemetry": TELEMETRY,
+}
+
+
+def command(msg):
+    if msg["action"] == "stats":
+        return "stats_" + msg["type"]
+    if msg["action"] == "telemetry" and "raw" in msg:
+        return "telemetry_raw"
+    return msg["action"]
+
+
+class Server(http.server.ThreadingHTTPServer):
+    # all rpc commands connect at once, the default backlog of 5 is too small
+    request_queue_size = 64
+
+
+class Node(object):
+    """Stand-in nano_node rpc server on localhost"""
+
+    def __init__(self):
+        self.responses = json.loads(json.dumps(RESPONSES))
+        self.delays = {}
+        self.hits = {}
+        node = self
+
+        class Handler(http.server.BaseHTTPRequestHandler):
+            def do_POST(self):
+                a = command(json.loads(self.rfile.read(int(self.headers["Content-Length"]))))
+                node.hits[a] = node.hits.get(a, 0) + 1
+                # a delayed answer trickles leading whitespace, so no single
+                # socket read times out and only the cycle deadline applies
+                ticks = int(node.delays.get(a, 0) / 0.1)
+                body = json.dumps(node.responses[a]).encode()
+                try:
+                    self.send_response(200)
+                    self.send_header("Content-Length", str(ticks + len(body)))
+                    self.end_headers()
+                    for _ in range(ticks):
+                        self.wfile.write(b" ")
+                        self.wfile.flush()
+                        time.sleep(0.1)
+                    self.wfile.write(body)
+                except OSError:
+                    pass
+
+            def log_message(self, *args):
+                pass
+
+        self.server = Server(("127.0.0.1", 0), Handler)
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+
+@pytest.fixture
+def node():
+    node = Node()
+    yield node
+    node.server.shutdown()
+
+
+def make_exporter(node, deadline=1.0):
+    config = SimpleNamespace(
+        rpc_ip="127.0.0.1",
+        rpc_port=str(node.server.server_port),
+        cycle_deadline=deadline,
+        node_data_path="/nonexistent/",
+    )
+    registry = CollectorRegistry()
+    rpcLatency = Histogram("nano_rpc_response", "response time from rpc calls", ["method"], registry=registry)
+    rpc = nanoRPC(config)
+    prom = nanoProm(config, registry)
+    prom.addSources(list(rpc.Commands) + ["process"])
+
+    def cycle():
+        stats = rpc.gatherStats(rpcLatency)
+        prom.update(stats)
+        return stats
+
+    return rpc, registry, cycle
+
+
+def test_full_cycle(node):
+    rpc, registry, cycle = make_exporter(node)
+
+    cycle()
+
+    assert registry.get_sample_value("nano_block_count", {"type": "count"}) == 10
+    assert registry.get_sample_value("telemetry_raw_blocks", {"endpoint": "::1:54000"}) == 5
+    assert registry.get_sample_value("nano_confirmation_history", {"count": "2"}) == 150
+    assert registry.get_sample_value("nano_prom_staleness_seconds", {"source": "telemetry"}) < 1
+
+
+def test_slow_telemetry_does_not_blank_block_count(node):
+    node.delays["telemetry"] = 2.5
+    rpc, registry, cycle = make_exporter(node, deadline=0.5)
+
+    started = time.time()
+    stats = cycle()
+    assert time.time() - started < 1.5
+    assert stats.Telemetry is None
+    assert registry.get_sample_value("nano_block_count", {"type": "count"}) == 10
+
+    # still in flight, so the next cycle skips it instead of piling up
+    cycle()
+    assert node.hits["telemetry"] == 1
+    assert node.hits["block_count"] == 2
+
+
+def test_rpc_error_keeps_last_good_value(node):
+    rpc, registry, cycle = make_exporter(node)
+    cycle()
+
+    node.responses["block_count"] = {"error": "Unable to read"}
+    stats = cycle()
+
+    assert stats.BlockCount == RESPONSES["block_count"]
+    assert registry.get_sample_value("nano_block_count", {"type": "count"}) == 10
+
+
+def test_missing_payload_does_not_refresh_staleness(node):
+    node.responses["telemetry_raw"] = {}
+    rpc, registry, cycle = make_exporter(node)
+
+    stats = cycle()
+
+    assert stats.TelemetryRaw is None
+    assert "telemetry_raw" not in rpc.lastSuccess
+    assert registry.get_sample_value("nano_prom_last_success_timestamp", {"source": "telemetry_raw"}) == 0
+    assert registry.get_sample_value("nano_block_count", {"type": "count"}) == 10
+
+
+def test_malformed_nested_field_skips_only_its_gauges(node):
+    node.responses["confirmation_history"] = {}
+    node.responses["peers"] = {}
+    rpc, registry, cycle = make_exporter(node)
+
+    cycle()
+
+    assert registry.get_sample_value("nano_node_peer_count") == 0
+    assert registry.get_sample_value("nano_confirmation_history", {"count": "2"}) is None
+    assert registry.get_sample_value("nano_block_count", {"type": "count"}) == 10
+    assert registry.get_sample_value("nano_stats_counters", {"type": "ledger", "detail": "all", "dir": "in"}) == 3
+
+
+def test_never_answered_source_is_stale(node):
+    node.responses["telemetry"] = {"error": "not ready"}
+    rpc, registry, cycle = make_exporter(node)
+
+    time.sleep(0.2)
+    cycle()
+
+    assert registry.get_sample_value("nano_prom_last_success_timestamp", {"source": "telemetry"}) == 0
+    assert registry.get_sample_value("nano_prom_staleness_seconds", {"source": "telemetry"}) >= 0.2
+    assert registry.get_sample_value("nano_prom_last_success_timestamp", {"source": "process"}) == 0
@@ -0,0 +1,93 @@
+import threading
+import time
+
+from prometheus_client import CollectorRegistry, Gauge
+
+from nano_prom_exporter.pipeline import Pipeline, Snapshot, _EMPTY
+
+
+def test_latest_queue_drops_oldest():
+    registry = CollectorRegistry()
+    pipeline = Pipeline(registry, depth=2)
+    queue = pipeline.queue("test")
+
+    for item in range(5):
+        queue.put(item)
+
+    assert queue.get(timeout=0) == 3
+    assert queue.get(timeout=0) == 4
+    assert queue.get(timeout=0) is _EMPTY
+    assert registry.get_sample_value("nano_prom_pipeline_dropped_total", {"queue": "test"}) == 3
+    assert registry.get_sample_value("nano_prom_pipeline_queue_depth", {"queue": "test"}) == 0
+
+
+def test_depth_is_at_least_one():
+    registry = CollectorRegistry()
+    queue = Pipeline(registry, depth=0).queue("test")
+
+    queue.put("snapshot")
+
+    assert queue.get(timeout=0) == "snapshot"
+    assert registry.get_sample_value("nano_prom_pipeline_dropped_total", {"queue": "test"}) == 0
+
+
+def test_stop_drains_inbox():
+    registry = CollectorRegistry()
+    pipeline = Pipeline(registry, depth=10)
+    inbox = pipeline.queue("inbox")
+    published = []
+    release = threading.Event()
+
+    def publish(item):
+        release.wait()
+        published.append(item)
+
+    pipeline.stage("publish", publish, inbox=inbox)
+    pipeline.start()
+    for item in range(5):
+        inbox.put(item)
+
+    stopper = threading.Thread(target=pipeline.stop)
+    stopper.start()
+    release.set()
+    stopper.join(timeout=10)
+
+    assert not stopper.is_alive()
+    assert published == [0, 1, 2, 3, 4]
+
+
+def test_stage_errors_do_not_stop_the_stage():
+    registry = CollectorRegistry()
+    pipeline = Pipeline(registry)
+    outbox = pipeline.queue("out")
+    calls = []
+
+    def gather():
+        calls.append(1)
+        if len(calls) == 1:
+            raise Exception("rpc down")
+        return len(calls)
+
+    pipeline.stage("gather", gather, outbox=outbox, interval=0.01)
+    pipeline.start()
+    deadline = time.time() + 5
+    while len(calls) < 3 and time.time() < deadline:
+        time.sleep(0.01)
+    pipeline.stop()
+
+    assert len(calls) >= 3
+    assert outbox.get(timeout=0) == len(calls)
+    assert registry.get_sample_value("nano_prom_pipeline_stage_seconds_count", {"stage": "gather"}) >= 2
+
+
+def test_snapshot_is_frozen():
+    registry = CollectorRegistry()
+    gauge = Gauge("nano_test", "test", registry=registry)
+    gauge.set(1)
+
+    snapshot = Snapshot(registry, 1000)
+    gauge.set(2)
+
+    values = [sample.value for metric in snapshot.collect() for sample in metric.samples]
+    assert values == [1]
+    assert snapshot.timestamp == 1000
@@ -0,0 +1,70 @@
+import os
+import tracemalloc
+
+from prometheus_client import CollectorRegistry
+
+from nano_prom_exporter.profiler import CycleProfiler
+
+
+def work():
+    return sum(i * i for i in range(10000)), [bytes(100) for _ in range(100)]
+
+
+def test_profiles_requested_cycles(tmp_path):
+    registry = CollectorRegistry()
+    profiler = CycleProfiler(str(tmp_path), cycles=3, top=5, registry=registry)
+
+    profiler.request()
+    for _ in range(3):
+        assert not os.listdir(tmp_path)
+        with profiler.cycle():
+            work()
+        with profiler.section():
+            work()
+
+    files = os.listdir(tmp_path)
+    assert len(files) == 3
+    for suffix in (".pstats", "_cpu.txt", "_alloc.txt"):
+        assert [name for name in files if name.endswith(suffix)]
+    functions = [
+        sample.labels["function"]
+        for metric in registry.collect()
+        if metric.name == "nano_prom_profile_function_seconds"
+        for sample in metric.samples
+    ]
+    assert 0 < len(functions) <= 5
+    assert not tracemalloc.is_tracing()
+
+
+def test_idle_profiler_does_nothing(tmp_path):
+    profiler = CycleProfiler(str(tmp_path), cycles=2)
+
+    with profiler.cycle():
+        work()
+
+    assert os.listdir(tmp_path) == []
+    assert not tracemalloc.is_tracing()
+
+
+def test_negative_cycles_still_finish(tmp_path):
+    profiler = CycleProfiler(str(tmp_path), cycles=-1)
+
+    profiler.request()
+    with profiler.cycle():
+        work()
+
+    assert not tracemalloc.is_tracing()
+    assert [name for name in os.listdir(tmp_path) if name.endswith(".pstats")]
+
+
+def test_report_errors_do_not_fail_the_cycle(tmp_path):
+    blocker = tmp_path / "file"
+    blocker.write_text("")
+    profiler = CycleProfiler(str(blocker / "profiles"), cycles=1)
+
+    profiler.request()
+    with profiler.cycle():
+        result = work()
+
+    assert result[0] == sum(i * i for i in range(10000))
+    assert not tracemalloc.is_tracing()
@@ -0,0 +1,202 @@
+import http.server
+import struct
+import threading
+from types import SimpleNamespace
+
+import pytest
+from prometheus_client import CollectorRegistry, Gauge
+
+from nano_prom_exporter import remoteWrite
+
+
+def uvarint(data, i):
+    result = shift = 0
+    while True:
+        byte = data[i]
+        i += 1
+        result |= (byte & 0x7F) << shift
+        shift += 7
+        if byte < 0x80:
+            return result, i
+
+
+def snappy_decompress(data):
+    """Literal-only decoder, enough for the fallback encoder"""
+    length, i = uvarint(data, 0)
+    out = bytearray()
+    while i < len(data):
+        tag = data[i]
+        i += 1
+        assert tag & 3 == 0, "only literals expected"
+        size = tag >> 2
+        if size < 60:
+            size += 1
+        else:
+            extra = size - 59
+            size = int.from_bytes(data[i:i + extra], "little") + 1
+            i += extra
+        out += data[i:i + size]
+        i += size
+    assert len(out) == length
+    return bytes(out)
+
+
+def fields(data):
+    i = 0
+    while i < len(data):
+        key, i = uvarint(data, i)
+        number, wire = key >> 3, key & 7
+        if wire == 2:
+            size, i = uvarint(data, i)
+            yield number, data[i:i + size]
+            i += size
+        elif wire == 1:
+            yield number, struct.unpack("<d", data[i:i + 8])[0]
+            i += 8
+        else:
+            value, i = uvarint(data, i)
+            yield number, value
+
+
+def decode_write_request(data):
+    series = []
+    for _, ts in fields(data):
+        labels, samples = [], []
+        for number, payload in fields(ts):
+            if number == 1:
+                label = dict(fields(payload))
+                labels.append((label[1].decode(), label[2].decode()))
+            else:
+                sample = dict(fields(payload))
+                samples.append((sample[1], sample[2]))
+        series.append((labels, samples))
+    return series
+
+
+class Receiver(object):
+    """Stand-in remote-write receiver on localhost"""
+
+    def __init__(self):
+        self.requests = []
+        self.statuses = []
+        receiver = self
+
+        class Handler(http.server.BaseHTTPRequestHandler):
+            def do_POST(self):
+                body = self.rfile.read(int(self.headers["Content-Length"]))
+                status = receiver.statuses.pop(0) if receiver.statuses else 204
+                if status < 300:
+                    receiver.requests.append(
+                        (dict(self.headers), decode_write_request(snappy_decompress(body)))
+                    )
+                self.send_response(status)
+                self.end_headers()
+
+            def log_message(self, *args):
+                pass
+
+        self.server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.url = "http://127.0.0.1:%s/api/v1/push" % self.server.server_port
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def series(self):
+        return [series for _, request in self.requests for series in request]
+
+
+@pytest.fixture
+def receiver():
+    receiver = Receiver()
+    yield receiver
+    receiver.server.shutdown()
+
+
+@pytest.fixture(autouse=True)
+def no_snappy(monkeypatch):
+    monkeypatch.setattr(remoteWrite, "snappy", None)
+
+
+def make_sink(url, registry, max_samples=1000, shards=3):
+    config = SimpleNamespace(
+        remote_write=url,
+        remote_write_max_samples=max_samples,
+        remote_write_max_age=60,
+        remote_write_shards=shards,
+        hostname="host",
+        runid="run",
+    )
+    return remoteWrite.RemoteWrite(config, registry)
+
+
+def test_snappy_fallback_roundtrip():
+    for data in [b"", b"a", b"x" * 60, b"y" * 61, bytes(range(256)) * 1000]:
+        assert snappy_decompress(remoteWrite.snappy_compress(data)) == data
+
+
+def test_encode_write_request_roundtrip():
+    series = {(("__name__", "up"), ("job", "j")): [(1.5, 1000), (2.0, 2000)]}
+    assert decode_write_request(remoteWrite.encode_write_request(series)) == [
+        ([("__name__", "up"), ("job", "j")], [(1.5, 1000), (2.0, 2000)])
+    ]
+
+
+def test_batches_snapshots_with_timestamps(receiver):
+    registry = CollectorRegistry()
+    gauge = Gauge("nano_test", "test", ["type", "a"], registry=registry)
+    for i in range(30):
+        gauge.labels(str(i), "z").set(i)
+    sink = make_sink(receiver.url, registry)
+
+    sink.addSnapshot(registry.collect(), 1000)
+    gauge.labels("7", "z").set(70)
+    sink.addSnapshot(registry.collect(), 1010)
+    sink.flush()
+
+    assert len(receiver.requests) == 3
+    for headers, _ in receiver.requests:
+        assert headers["Content-Encoding"] == "snappy"
+        assert headers["Content-Type"] == "application/x-protobuf"
+
+    series = {tuple(labels): samples for labels, samples in receiver.series()}
+    for labels in series:
+        assert list(labels) == sorted(labels)
+    assert series[
+        (("__name__", "nano_test"), ("a", "z"), ("instance", "host"), ("job", "run"), ("type", "7"))
+    ] == [(7.0, 1000000), (70.0, 1010000)]
+
+
+def test_flushes_when_batch_is_full(receiver):
+    registry = CollectorRegistry()
+    gauge = Gauge("nano_test", "test", ["type"], registry=registry)
+    for i in range(10):
+        gauge.labels(str(i)).set(i)
+    sink = make_sink(receiver.url, registry, max_samples=15, shards=1)
+
+    sink.addSnapshot(registry.collect(), 1000)
+    sink.maybeFlush()
+    assert receiver.requests == []
+
+    sink.addSnapshot(registry.collect(), 1010)
+    sink.maybeFlush()
+    assert len(receiver.requests) == 1
+
+
+def test_retries_transient_errors_and_drops_rejected(receiver):
+    registry = CollectorRegistry()
+    Gauge("nano_test", "test", registry=registry).set(1)
+    sink = make_sink(receiver.url, registry, shards=1)
+
+    receiver.statuses = [503]
+    sink.addSnapshot(registry.collect(), 1000)
+    sink.flush()
+    assert receiver.requests == []
+
+    sink.addSnapshot(registry.collect(), 1010)
+    sink.flush()
+    samples = [samples for labels, samples in receiver.series() if ("__name__", "nano_test") in labels]
+    assert samples == [[(1.0, 1000000), (1.0, 1010000)]]
+
+    receiver.statuses = [400]
+    sink.addSnapshot(registry.collect(), 1020)
+    sink.flush()
+    assert len(receiver.requests) == 1
+    assert registry.get_sample_value("nano_prom_remote_write_failed_samples_total") > 0